@@ -1,6 +1,6 @@
 # warranty/__init__.py
 # Keep this lightweight; do not import Django / InvenTree here.
-PLUGIN_VERSION = "0.2.0"
+PLUGIN_VERSION = "0.2.0"  # single source of truth; core.Warranty re-exports it
 
 from .core import Warranty  # OK: core only uses plugin mixins at runtime
 
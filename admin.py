@@ -1,5 +1,6 @@
 import json, logging, os, requests
 from datetime import datetime, date, timezone
+from functools import lru_cache
 from typing import Any, Dict, Optional
 import logging
 
@@ -8,7 +9,7 @@ from django.urls import path
 from django.shortcuts import redirect
 from django.db import transaction
 from plugin import registry
-from .models import SafetyCultureRecord
+from .models import SafetyCultureRecord, add_years
 
 from django.contrib.admin.sites import AlreadyRegistered
 
@@ -113,8 +114,13 @@ def _resp_text(resp):
     return None
 
 
-def _find_regex(payload, pattern: str):
-    """Search any response text/value for a regex match; returns first match or None."""
+# Fallback patterns used when the configured labels are missing
+_UMS_SN_RE = r"\b\d{4}-\d{4}\b"
+_TM_ID_RE = r"\bTM[0-9A-Z]{3,}\b"
+
+def _find_regex(payload, pattern):
+    """Search any response text/value for a regex match; returns first match or None.
+    `pattern` may be a string or an already compiled pattern."""
     try:
         rx = re.compile(pattern)
     except Exception:
@@ -142,22 +148,18 @@ def _find_by_label(payload, label):
                 return str(val)
     return None
 
-def _add_years(d: date, years: int) -> date:
+@lru_cache(maxsize=1)
+def _load_rules(rules_json: str) -> dict:
+    """Parse SERIAL_PREFIX_RULES once per distinct setting value (treat the result as read-only)."""
     try:
-        from dateutil.relativedelta import relativedelta
-        return d + relativedelta(years=years)
+        rules = json.loads(rules_json or "{}")
     except Exception:
-        try:
-            return d.replace(year=d.year + years)
-        except ValueError:
-            return d.replace(month=2, day=28, year=d.year + years)
+        return {}
+    return rules if isinstance(rules, dict) else {}
 
 def _model_and_years_from_serial(unit_sn: str, rules_json: str) -> tuple[str, int]:
     s = (unit_sn or "").strip().upper()
-    try:
-        rules = json.loads(rules_json or "{}")
-    except Exception:
-        rules = {}
+    rules = _load_rules(rules_json)
     best_key, best_len = None, -1
     for k in rules.keys():
         ku = str(k).upper()
@@ -243,6 +245,14 @@ def run_sc_sync(*, incremental: bool = True, print_each: bool = False, verify_on
     # 1) list candidate audits
     rows = _list_audits(base_url, token, template, cursor_in or None)
 
+    # Verification only asks "do we have this audit_id?": answer it from one query
+    # for the whole run instead of an exists() round-trip per listed audit
+    known_audit_ids: set[str] = set()
+    if verify_only and rows:
+        known_audit_ids = set(
+            SafetyCultureRecord.objects.filter(audit_id__isnull=False).values_list("audit_id", flat=True)
+        )
+
     for row in rows:
         try:
             audit_id = row.get("audit_id")
@@ -253,7 +263,7 @@ def run_sc_sync(*, incremental: bool = True, print_each: bool = False, verify_on
 
             if verify_only:
                 # verification mode: ensure present
-                if audit_id and not SafetyCultureRecord.objects.filter(audit_id=audit_id).exists():
+                if audit_id and audit_id not in known_audit_ids:
                     logger.warning("Missing in DB: audit_id=%s (modified_at=%s)", audit_id, row.get("modified_at"))
                 continue
 
@@ -271,7 +281,7 @@ def run_sc_sync(*, incremental: bool = True, print_each: bool = False, verify_on
                 or (_find_by_label(detail, "UMS SN") or "")
             ).strip()
             if not ums_sn:
-                ums_sn = (_find_regex(detail, r"\b\d{4}-\d{4}\b") or "").strip()
+                ums_sn = (_find_regex(detail, _UMS_SN_RE) or "").strip()
             ums_sn = ums_sn or None
 
             # TM Device ID: prefer configured label, then common labels, then regex TMxxxx...
@@ -282,7 +292,7 @@ def run_sc_sync(*, incremental: bool = True, print_each: bool = False, verify_on
                 or (_find_by_label(detail, "Unit QR Code") or "")
             ).strip()
             if not tm_id:
-                tm_id = (_find_regex(detail, r"\bTM[0-9A-Z]{3,}\b") or "").strip()
+                tm_id = (_find_regex(detail, _TM_ID_RE) or "").strip()
             tm_id = tm_id or None
 
             ad_meta = detail.get("audit_data") or {}
@@ -297,22 +307,34 @@ def run_sc_sync(*, incremental: bool = True, print_each: bool = False, verify_on
                 continue
 
             model_number, years = _model_and_years_from_serial(unit_sn, rules)
-            warranty_expiry = _add_years(audit_date, years)
-
+            warranty_expiry = add_years(audit_date, years)
+
+            values = dict(
+                audit_id=audit_id,
+                model_number=model_number,
+                ums_sn=ums_sn,
+                tm_device_id=tm_id,
+                audit_date=audit_date,
+                warranty_expiry=warranty_expiry,
+                sc_modified_at=mod_at,
+                payload=detail,
+            )
             with transaction.atomic():
-                obj, was_created = SafetyCultureRecord.objects.update_or_create(
-                    unit_sn=unit_sn,
-                    defaults=dict(
-                        audit_id=audit_id,
-                        model_number=model_number,
-                        ums_sn=ums_sn,
-                        tm_device_id=tm_id,
-                        audit_date=audit_date,
-                        warranty_expiry=warranty_expiry,
-                        sc_modified_at=mod_at,
-                        payload=detail,
-                    ),
-                )
+                obj = SafetyCultureRecord.objects.with_payload().select_for_update().filter(unit_sn=unit_sn).first()
+                was_created = obj is None
+                # Normalize the incoming values the way save() will, so the diff below
+                # compares like with like (model_number, ums_sn formatting, ...)
+                cand = SafetyCultureRecord(unit_sn=unit_sn, **values)
+                cand._normalize()
+                if was_created:
+                    cand.save()
+                else:
+                    # Only write the columns that changed, so an unchanged payload is not rewritten
+                    changed = [k for k in values if getattr(obj, k) != getattr(cand, k)]
+                    if changed:
+                        for k in changed:
+                            setattr(obj, k, getattr(cand, k))
+                        obj.save(update_fields=changed + ["updated"])
 
             if was_created:
                 created += 1
@@ -413,6 +435,7 @@ class SafetyCultureRecordAdmin(admin.ModelAdmin):
     list_display = ("unit_sn", "model_number", "audit_date", "warranty_expiry", "ums_sn", "tm_device_id", "audit_id", "sc_modified_at")
     search_fields = ("unit_sn", "model_number", "ums_sn", "tm_device_id", "audit_id")
     list_filter = ("audit_date",)
+    ordering = ("-audit_date", "unit_sn")
     actions = [sync_from_safetyculture, verify_all_synced]
 # try:
 # except AlreadyRegistered:
@@ -12,6 +12,8 @@ from plugin import InvenTreePlugin
 from plugin.mixins import AppMixin, SettingsMixin
 from django.utils.translation import gettext_lazy as _
 
+from . import PLUGIN_VERSION  # single source of truth, defined in __init__.py
+
 
 class Warranty(AppMixin, SettingsMixin, InvenTreePlugin):
     """
@@ -27,9 +29,7 @@ class Warranty(AppMixin, SettingsMixin, InvenTreePlugin):
     TITLE = "Warranty"
     NAME = "warranty"   # Must match the identifier you enable in config.yaml / UI
     SLUG = "warranty"
-    PLUGIN_VERSION = "0.2.0"
-
-    __all__ = ["PLUGIN_VERSION"]
+    PLUGIN_VERSION = PLUGIN_VERSION
 
     # If you do not ship a custom admin frontend (Settings.js), keep this as None
     ADMIN_SOURCE = None
@@ -89,15 +89,16 @@ class Warranty(AppMixin, SettingsMixin, InvenTreePlugin):
             "default": '{"IG": {"length": 3, "warranty": 3}}',
         },
 
+        # Internal sync state: plain strings, no translation needed
         "SC_SYNC_CURSOR": {  # ISO-8601 string of last modified_at processed
-            "name": _("Sync Cursor (modified_after)"),
-            "description": _("Internal – last processed SafetyCulture modified_at"),
+            "name": "Sync Cursor (modified_after)",
+            "description": "Internal – last processed SafetyCulture modified_at",
             "validator": str,
             "default": "",
         },
         "SC_SYNC_MODE": {
-            "name": _("Sync Mode"),
-            "description": _("incremental|full"),
+            "name": "Sync Mode",
+            "description": "incremental|full",
             "validator": str,
             "default": "incremental",
         },
@@ -1,8 +1,33 @@
-from django.core.management.base import BaseCommand
+import logging
+import zlib
+from functools import lru_cache
+from itertools import islice
+from operator import attrgetter
+
+from django.core.management.base import BaseCommand, CommandError
 from django.apps import apps
 from django.db import transaction
+from django.db.models.functions import Lower
+
+from warranty.models import SafetyCultureRecord, WarrantyBuildLink, WarrantySyncState
+
+logger = logging.getLogger(__name__)
+
+# Default rows per chunk: one prefetch query, one transaction (commit) and one bulk
+# UPDATE each
+BATCH_SIZE = 500
+
+# Rows fetched per round-trip when streaming SafetyCultureRecord
+FETCH_CHUNK_SIZE = 1000
+
+# The only SafetyCultureRecord columns this command reads
+RECORD_FIELDS = ("unit_sn", "model_number", "audit_id", "audit_date", "warranty_expiry")
+
+# WarrantySyncState row locked by a chunk before it creates parts/builds
+CREATION_LOCK_KEY = "sc_to_buildorders"
 
-from warranty.models import SafetyCultureRecord
+# Build notes/description; starts with the SC_UNIT_SN=<unit_sn> traceability marker
+_NOTE_TMPL = "SC_UNIT_SN=%s | audit_id=%s | audit_date=%s | warranty_expiry=%s"
 
 
 def get_model(app_label, *names):
@@ -14,22 +39,44 @@ def get_model(app_label, *names):
     raise RuntimeError(f"Could not find model in {app_label}: tried {names}")
 
 
+@lru_cache(maxsize=None)
 def has_field(Model, name: str) -> bool:
+    # Model._meta.fields does not change at runtime, so the answer is safe to memoize
     return any(f.name == name for f in Model._meta.fields)
 
 
+def chunked(iterable, size: int):
+    """Yield lists of up to `size` items from `iterable`."""
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
 class Command(BaseCommand):
     help = "Create/Update Manufacturing Build Orders from Warranty SafetyCultureRecord rows (reference-safe)"
 
     def add_arguments(self, parser):
-        parser.add_argument("--limit", type=int, default=0, help="Limit number of records processed (0 = all)")
+        parser.add_argument("--limit", type=int, default=0, help="Limit number of records processed by this worker (0 = all)")
         parser.add_argument("--dry-run", action="store_true", help="Do not write anything")
         parser.add_argument("--category", default="SafetyCulture Units", help="Part category name to use/create")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Records per transaction/commit")
+        parser.add_argument("--num-workers", type=int, default=1, help="Total number of workers splitting the units")
+        parser.add_argument("--worker-id", type=int, default=0, help="This worker's slot (0 .. num-workers - 1)")
 
     def handle(self, *args, **opts):
         dry = opts["dry_run"]
         limit = opts["limit"]
         cat_name = opts["category"]
+        batch_size = opts["batch_size"]
+        num_workers = opts["num_workers"]
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        worker_id = opts["worker_id"]
+        if num_workers < 1 or not 0 <= worker_id < num_workers:
+            raise CommandError("--worker-id must be in 0 .. --num-workers - 1")
 
         PartCategory = get_model("part", "PartCategory")
         Part = get_model("part", "Part")
@@ -41,122 +88,257 @@ class Command(BaseCommand):
         title_field = "title" if has_field(Build, "title") else None
         notes_field = "notes" if has_field(Build, "notes") else ("description" if has_field(Build, "description") else None)
 
-        qs = SafetyCultureRecord.objects.order_by("unit_sn")
-        if limit and limit > 0:
-            qs = qs[:limit]
+        # Capability flags, resolved once instead of per row
+        part_has_ipn = has_field(Part, "IPN")
+        build_has_qty = has_field(Build, qty_field)
+
+        # Attribute getters for the update comparisons, bound once. The part is compared
+        # through its FK column (part_id) so the check never fetches the related Part.
+        get_part_id = attrgetter(Build._meta.get_field(part_field).attname)
+        get_qty = attrgetter(qty_field) if build_has_qty else None
+        get_title = attrgetter(title_field) if title_field else None
+        get_notes = attrgetter(notes_field) if notes_field else None
+
+        # Stream plain dicts of only the columns this command reads: no model instances
+        # are built and `payload` is never loaded.
+        # unit_sn is the primary key, so the ORDER BY is served by its index.
+        qs = SafetyCultureRecord.objects.order_by("unit_sn").values(*RECORD_FIELDS)
+        records = qs.iterator(chunk_size=FETCH_CHUNK_SIZE)
+        if num_workers > 1:
+            # Deterministic partition so parallel workers never share a unit. Applied
+            # before --limit, so each worker processes up to `limit` of its own units.
+            records = (
+                r for r in records
+                if zlib.crc32((r["unit_sn"] or "").strip().upper().encode()) % num_workers == worker_id
+            )
+        records = islice(records, limit if limit and limit > 0 else None)
 
         created_parts = 0
         created_builds = 0
         updated_builds = 0
         skipped = 0
+        locked = 0
 
         cat, _ = PartCategory.objects.get_or_create(name=cat_name)
 
         part_cache = {}
-
-        def get_or_make_part(model_number: str):
-            nonlocal created_parts
-            key = (model_number or "").strip().upper() or "UNKNOWN"
-            if key in part_cache:
-                return part_cache[key]
+        creation_locked = False  # reset at the start of every chunk transaction
+
+        def lock_creation() -> None:
+            """
+            Serialize part/build creation across concurrent runs (e.g. --num-workers)
+            until the current chunk commits. Units are partitioned, but parts and the
+            next BO-#### reference are shared: without this, two runs can create the
+            same "Unit <key>" part or pick the same build reference.
+            """
+            nonlocal creation_locked
+            if not creation_locked:
+                WarrantySyncState.objects.get_or_create(pk=CREATION_LOCK_KEY)
+                WarrantySyncState.objects.select_for_update().get(pk=CREATION_LOCK_KEY)
+                creation_locked = True
+
+        def part_key(model_number: str) -> str:
+            return (model_number or "").strip().upper() or "UNKNOWN"
+
+        def lookup_parts(missing: set) -> set:
+            """Cache existing parts for `missing` keys (IPN, then name); return keys still missing."""
+            if not missing:
+                return missing
 
             # Prefer IPN match if present
-            p = None
-            if has_field(Part, "IPN"):
-                p = Part.objects.filter(IPN=key).first()
+            if part_has_ipn:
+                for p in Part.objects.filter(IPN__in=missing):
+                    if p.IPN in missing:
+                        part_cache.setdefault(p.IPN, p)
+                missing -= part_cache.keys()
+
+            # Fall back to a case-insensitive "Unit <key>" name match
+            if missing:
+                by_name = {f"unit {k}".lower(): k for k in missing}
+                qs_parts = Part.objects.annotate(name_lower=Lower("name")).filter(name_lower__in=list(by_name))
+                for p in qs_parts:
+                    part_cache.setdefault(by_name[p.name_lower], p)
+                missing -= part_cache.keys()
+
+            return missing
+
+        def prefetch_parts(keys) -> int:
+            """
+            Resolve every uncached key with batched lookups (IPN, then name) and create
+            whatever is still missing under the creation lock. Returns the number of
+            parts created.
+            """
+            missing = lookup_parts({k for k in keys if k not in part_cache})
+            if not missing:
+                return 0
+
+            if dry:
+                for key in missing:
+                    part_cache[key] = None
+                return 0
 
-            if not p:
-                p = Part.objects.filter(name__iexact=f"Unit {key}").first()
+            # Another run may have created some of them while we waited for the lock
+            lock_creation()
+            missing = lookup_parts(missing)
 
-            if not p:
-                if dry:
-                    part_cache[key] = None
-                    return None
+            # Parts are created one by one (not bulk_create) so Part.save() still
+            # builds the MPTT tree fields.
+            to_create = sorted(missing)
+            for key in to_create:
                 fields = {
                     "name": f"Unit {key}",
                     "category": cat,
                     "description": "Auto-created from SafetyCulture warranty sync",
                 }
-                if has_field(Part, "IPN"):
+                if part_has_ipn:
                     fields["IPN"] = key
-                p = Part.objects.create(**fields)
-                created_parts += 1
-
-            part_cache[key] = p
-            return p
-
-        def marker(unit_sn: str) -> str:
-            return f"SC_UNIT_SN={unit_sn}"
-
-        for r in qs:
-            unit_sn = (r.unit_sn or "").strip().upper()
-            if not unit_sn:
-                skipped += 1
-                continue
-
-            p = get_or_make_part(r.model_number)
-            if dry and p is None:
-                skipped += 1
+                part_cache[key] = Part.objects.create(**fields)
+
+            return len(to_create)
+
+        # Only these columns go through bulk_update. A part or quantity change must run
+        # Build.save() and its post_save handling (validation, BuildLine refresh).
+        cosmetic_fields = [f for f in (title_field, notes_field) if f]
+
+        for batch in chunked(records, batch_size):
+            rows = []
+            for r in batch:
+                unit_sn = (r["unit_sn"] or "").strip().upper()
+                if not unit_sn:
+                    skipped += 1
+                    continue
+                rows.append((unit_sn, r))
+            if not rows:
                 continue
 
-            # Find existing build order for this unit
-            existing = None
-            if title_field:
-                existing = Build.objects.filter(**{title_field: unit_sn}).first()
-            elif notes_field:
-                existing = Build.objects.filter(**{f"{notes_field}__contains": marker(unit_sn)}).first()
-
-            # Compose notes/description (helps traceability)
-            note = f"{marker(unit_sn)} | audit_id={r.audit_id} | audit_date={r.audit_date} | warranty_expiry={r.warranty_expiry}"
-
             with transaction.atomic():
-                if existing:
-                    if dry:
-                        updated_builds += 1
+                creation_locked = False
+
+                # Prefetch and lock existing build orders for the whole chunk: linked units
+                # by primary key, then units built before WarrantyBuildLink existed by title.
+                # Builds locked by another run are skipped rather than waited for. A dry run
+                # writes nothing, so it takes no locks (and never makes a real run skip).
+                sns = [sn for sn, _ in rows]
+                locking = Build.objects if dry else Build.objects.select_for_update(skip_locked=True)
+                linked = dict(WarrantyBuildLink.objects.filter(unit_sn__in=sns).values_list("unit_sn", "build_pk"))
+                builds_by_pk = locking.in_bulk(set(linked.values()))
+                existing_map = {sn: builds_by_pk[pk] for sn, pk in linked.items() if pk in builds_by_pk}
+
+                # A build that exists but was not returned is locked, not missing;
+                # leave it to the next run instead of creating a duplicate
+                busy = set()
+                unseen_pks = set(linked.values()) - builds_by_pk.keys()
+                if unseen_pks:
+                    busy_pks = set(Build.objects.filter(pk__in=unseen_pks).values_list("pk", flat=True))
+                    busy.update(sn for sn, pk in linked.items() if pk in busy_pks)
+
+                # Busy linked units stay out of the title lookup, so no other build with
+                # the same title can be matched (and re-linked) in their place
+                unlinked = [sn for sn in sns if sn not in existing_map and sn not in busy]
+                if title_field and unlinked:
+                    # in_bulk(field_name=title_field) would be the natural call, but Django
+                    # only allows it on unique fields and Build.title is not unique. One
+                    # title__in query ordered by pk gives the same single round-trip and
+                    # keeps the oldest build when a title is duplicated, like .first() did.
+                    for b in locking.filter(**{f"{title_field}__in": unlinked}).order_by("pk"):
+                        existing_map.setdefault(getattr(b, title_field), b)
+
+                unseen = [sn for sn in unlinked if sn not in existing_map]
+                if title_field and unseen:
+                    busy.update(Build.objects.filter(**{f"{title_field}__in": unseen}).values_list(title_field, flat=True))
+
+                changed_builds = {}
+                created_parts += prefetch_parts({part_key(r["model_number"]) for _, r in rows})
+
+                for unit_sn, r in rows:
+                    if unit_sn in busy:
+                        logger.info("Build for unit %s is locked by another run; skipping", unit_sn)
+                        locked += 1
                         continue
 
-                    changed = False
-                    if getattr(existing, part_field, None) != p:
-                        setattr(existing, part_field, p)
-                        changed = True
-                    if has_field(Build, qty_field) and getattr(existing, qty_field) != 1:
-                        setattr(existing, qty_field, 1)
-                        changed = True
-                    if title_field and getattr(existing, title_field, "") != unit_sn:
-                        setattr(existing, title_field, unit_sn)
-                        changed = True
-                    if notes_field:
-                        cur = getattr(existing, notes_field) or ""
-                        if marker(unit_sn) not in cur:
-                            setattr(existing, notes_field, note)
+                    p = part_cache[part_key(r["model_number"])]
+                    if dry and p is None:
+                        skipped += 1
+                        continue
+
+                    # Find existing build order for this unit
+                    existing = existing_map.get(unit_sn)
+                    if existing is None and not title_field and notes_field:
+                        # Legacy unlinked unit: scan notes once, then it gets a link row
+                        existing = Build.objects.filter(**{f"{notes_field}__contains": f"SC_UNIT_SN={unit_sn}"}).first()
+                        if existing:
+                            existing_map[unit_sn] = existing
+
+                    # Compose notes/description (helps traceability)
+                    note = _NOTE_TMPL % (unit_sn, r["audit_id"], r["audit_date"], r["warranty_expiry"])
+
+                    if existing:
+                        if dry:
+                            updated_builds += 1
+                            continue
+
+                        structural = False
+                        if get_part_id(existing) != p.pk:
+                            setattr(existing, part_field, p)
+                            structural = True
+                        if get_qty and get_qty(existing) != 1:
+                            setattr(existing, qty_field, 1)
+                            structural = True
+
+                        changed = False
+                        if get_title and get_title(existing) != unit_sn:
+                            setattr(existing, title_field, unit_sn)
                             changed = True
-                        elif cur != note:
+                        if get_notes and (get_notes(existing) or "") != note:
                             setattr(existing, notes_field, note)
                             changed = True
 
-                    if changed:
-                        existing.save()
-                    updated_builds += 1
+                        if structural:
+                            existing.save()
+                            changed_builds.pop(existing.pk, None)
+                        elif changed:
+                            changed_builds[existing.pk] = existing
+                        updated_builds += 1
 
-                else:
-                    if dry:
+                    else:
+                        if dry:
+                            created_builds += 1
+                            continue
+
+                        fields = {
+                            part_field: p,
+                            qty_field: 1,
+                        }
+
+                        # IMPORTANT: Do NOT set reference. InvenTree will auto-generate BO-####.
+                        # Builds are created one by one (not bulk_create) so save() still assigns
+                        # the reference and the MPTT tree fields.
+                        if title_field:
+                            fields[title_field] = unit_sn
+                        if notes_field:
+                            fields[notes_field] = note
+
+                        lock_creation()
+                        existing_map[unit_sn] = Build.objects.create(**fields)
                         created_builds += 1
-                        continue
-
-                    fields = {
-                        part_field: p,
-                        qty_field: 1,
-                    }
-
-                    # IMPORTANT: Do NOT set reference. InvenTree will auto-generate BO-####.
-                    if title_field:
-                        fields[title_field] = unit_sn
-                    if notes_field:
-                        fields[notes_field] = note
 
-                    Build.objects.create(**fields)
-                    created_builds += 1
+                if changed_builds:
+                    Build.objects.bulk_update(list(changed_builds.values()), fields=cosmetic_fields, batch_size=batch_size)
+
+                if not dry:
+                    links = [
+                        WarrantyBuildLink(unit_sn=sn, build_pk=b.pk)
+                        for sn, b in existing_map.items()
+                        if sn not in busy and linked.get(sn) != b.pk
+                    ]
+                    if links:
+                        # Replace stale rows, then insert: portable across backends (MySQL
+                        # does not support bulk_create(unique_fields=...) upserts)
+                        stale = [link.unit_sn for link in links if link.unit_sn in linked]
+                        if stale:
+                            WarrantyBuildLink.objects.filter(unit_sn__in=stale).delete()
+                        WarrantyBuildLink.objects.bulk_create(links, batch_size=batch_size)
 
         self.stdout.write(self.style.SUCCESS(
-            f"Done. parts_created={created_parts} builds_created={created_builds} builds_updated={updated_builds} skipped={skipped} dry_run={dry}"
+            f"Done. parts_created={created_parts} builds_created={created_builds} builds_updated={updated_builds} skipped={skipped} locked={locked} dry_run={dry}"
         ))
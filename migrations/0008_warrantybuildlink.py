@@ -0,0 +1,25 @@
+# Generated by Django 4.2.26 on 2026-10-14 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warranty', '0007_warrantysyncstate_alter_safetyculturerecord_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WarrantyBuildLink',
+            fields=[
+                ('unit_sn', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('build_pk', models.PositiveIntegerField(db_index=True, help_text='Primary key of the InvenTree Build order for this unit.')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Warranty Build Link',
+                'verbose_name_plural': 'Warranty Build Links',
+            },
+        ),
+    ]
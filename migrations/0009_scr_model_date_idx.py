@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-14 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warranty', '0008_warrantybuildlink'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='safetyculturerecord',
+            name='warranty_sa_model_n_c463fa_idx',
+        ),
+        migrations.AddIndex(
+            model_name='safetyculturerecord',
+            index=models.Index(fields=['model_number', '-audit_date'], name='scr_model_date_idx'),
+        ),
+    ]
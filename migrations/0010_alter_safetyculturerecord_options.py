@@ -0,0 +1,17 @@
+# Generated by Django 4.2.26 on 2026-10-14 10:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warranty', '0009_scr_model_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='safetyculturerecord',
+            options={'verbose_name': 'SafetyCulture Record', 'verbose_name_plural': 'SafetyCulture Records'},
+        ),
+    ]
@@ -5,14 +5,78 @@ Django models for the Warranty plugin.
 Contains:
 - SafetyCultureRecord: a normalized row per device/unit pulled from SafetyCulture.
   Uses `unit_sn` (e.g., IG1…) as the primary key to prevent duplicates for the same unit.
+  `SafetyCultureRecord.bulk_upsert()` writes many rows at once and sends `post_bulk_upsert`.
+- WarrantySyncState: incremental sync cursor.
+- WarrantyBuildLink: unit_sn → Build order mapping used by `sc_to_buildorders`.
 
 Notes:
 - Keep this module import-light (no requests, no plugin imports).
 - Business logic that touches external APIs should live in admin.py or services modules.
 """
 
-from django.db import models
+from django.db import connections, models, router
 from django.core.validators import RegexValidator
+from django.dispatch import Signal
+
+try:
+    from dateutil.relativedelta import relativedelta  # optional dep, resolved once at import
+except ImportError:
+    relativedelta = None
+
+# Columns that save() derives from other fields
+_DERIVED_FIELDS = ("model_number", "warranty_expiry", "ums_sn")
+
+# Columns left out of save()'s change tracking: copying the JSON blob on every load
+# would cost more than it saves, so a loaded `payload` is always written
+_UNTRACKED_FIELDS = frozenset({"payload"})
+
+# Columns bulk_upsert() may overwrite on an existing unit_sn (only those a row supplies
+# or save() derives from it; see `_upsert_fields`)
+_UPSERT_FIELDS = [
+    "audit_id", "sc_modified_at", "model_number", "ums_sn", "audit_date",
+    "warranty_expiry", "tm_device_id", "payload", "updated",
+]
+
+
+def _upsert_fields(keys) -> list:
+    """Columns to overwrite for rows supplying `keys`: the given ones plus what save() derives."""
+    fields = set(keys) | {"model_number", "updated"}
+    if "audit_date" in keys:
+        fields.add("warranty_expiry")
+    return [f for f in _UPSERT_FIELDS if f in fields]
+
+
+# Sent after SafetyCultureRecord.bulk_upsert() with `instances=[...]`; bulk writes
+# do not send pre_save/post_save, so hook downstream updates here instead.
+post_bulk_upsert = Signal()
+
+
+if relativedelta is not None:
+    def add_years(d, years: int):
+        """Add whole years to a date (dateutil handles Feb 29)."""
+        return d + relativedelta(years=years)
+else:
+    def add_years(d, years: int):
+        """Add whole years to a date, mapping Feb 29 to Feb 28 in non-leap target years."""
+        try:
+            return d.replace(year=d.year + years)
+        except ValueError:
+            return d.replace(month=2, day=28, year=d.year + years)
+
+
+class SafetyCultureRecordManager(models.Manager):
+    """
+    Default manager for SafetyCultureRecord: defers the (large) `payload` JSON column.
+
+    Most queries never read it; it is loaded lazily on attribute access. Use
+    `SafetyCultureRecord.objects.with_payload()` when it is needed up front.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer("payload")
+
+    def with_payload(self):
+        return super().get_queryset()
 
 
 class SafetyCultureRecord(models.Model):
@@ -44,16 +108,19 @@ class SafetyCultureRecord(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = SafetyCultureRecordManager()
+
     class Meta:
-        # Useful default ordering when listing in admin/UI
-        ordering = ["-audit_date", "unit_sn"]
+        # No Meta.ordering on purpose: it would add ORDER BY to every query (counts,
+        # exists(), bulk scans). List views order explicitly (see admin.py).
         verbose_name = "SafetyCulture Record"
         verbose_name_plural = "SafetyCulture Records"
 
-        # Add DB indexes for common filters/sorts
+        # Add DB indexes for common filters/sorts. The composite index serves "records of
+        # model X, newest first" and also covers plain model_number lookups.
         indexes = [
             models.Index(fields=["audit_date"]),
-            models.Index(fields=["model_number"]),
+            models.Index(fields=["model_number", "-audit_date"], name="scr_model_date_idx"),
         ]
 
     def __str__(self) -> str:
@@ -62,25 +129,12 @@ class SafetyCultureRecord(models.Model):
     # --- helpers ---------------------------------------------------------------------
 
     def _add_years(self, d, years: int):
-        """
-        Add whole years to a date while handling leap years.
-        Tries dateutil.relativedelta if available, else falls back to naive replace().
-        """
-        try:
-            from dateutil.relativedelta import relativedelta  # local import (optional dep)
-            return d + relativedelta(years=years)
-        except Exception:
-            try:
-                return d.replace(year=d.year + years)
-            except ValueError:
-                # Handle Feb 29 → Feb 28 for non-leap target years
-                return d.replace(month=2, day=28, year=d.year + years)
-
-    # --- persistence hooks ------------------------------------------------------------
+        """Add whole years to a date while handling leap years (see module-level `add_years`)."""
+        return add_years(d, years)
 
-    def save(self, *args, **kwargs):
+    def _normalize(self) -> None:
         """
-        Normalize/derive fields before persisting:
+        Derive/normalize fields in place (shared by save() and bulk_upsert()):
           - model_number = first 3 chars of unit_sn (uppercased)
           - warranty_expiry = audit_date + 3 years (if not already provided)
           - ums_sn digits are normalized into 'xxxx-xxxx' when possible
@@ -91,7 +145,7 @@ class SafetyCultureRecord(models.Model):
 
         # Auto-calc warranty if audit_date present and expiry not explicitly set
         if self.audit_date and not self.warranty_expiry:
-            self.warranty_expiry = self._add_years(self.audit_date, 3)
+            self.warranty_expiry = add_years(self.audit_date, 3)
 
         # Normalize UMS serial into "xxxx-xxxx" if digits available
         if self.ums_sn:
@@ -99,7 +153,133 @@ class SafetyCultureRecord(models.Model):
             if len(digits) >= 8:
                 self.ums_sn = f"{digits[:4]}-{digits[4:8]}"
 
-        return super().save(*args, **kwargs)
+    def _snapshot(self) -> dict:
+        """Currently loaded (non-deferred) tracked column values, keyed by attname."""
+        deferred = self.get_deferred_fields()
+        return {
+            f.attname: getattr(self, f.attname)
+            for f in self._meta.concrete_fields
+            if f.attname not in deferred and f.attname not in _UNTRACKED_FIELDS
+        }
+
+    def _changed_fields(self):
+        """
+        Names of columns that differ from the values loaded from the DB, or None if
+        they cannot be determined (instance not loaded via the ORM, or pk changed).
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None or self.pk != loaded.get(self._meta.pk.attname):
+            return None
+        deferred = self.get_deferred_fields()
+        return {
+            f.name
+            for f in self._meta.concrete_fields
+            if not f.primary_key
+            and f.attname not in deferred
+            and (f.attname not in loaded or getattr(self, f.attname) != loaded[f.attname])
+        }
+
+    # --- persistence hooks ------------------------------------------------------------
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so save() can write only the columns that changed
+        instance._loaded_values = {k: v for k, v in zip(field_names, values) if k not in _UNTRACKED_FIELDS}
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        # Reloaded (e.g. lazily loaded deferred) tracked fields count as clean, not changed
+        if getattr(self, "_loaded_values", None) is not None:
+            snapshot = self._snapshot()
+            if fields is not None:
+                attnames = {self._meta.get_field(name).attname for name in fields}
+                snapshot = {k: v for k, v in snapshot.items() if k in attnames}
+            self._loaded_values.update(snapshot)
+
+    def save(self, *args, **kwargs):
+        """
+        Normalize/derive fields before persisting (see `_normalize`).
+
+        Updates of rows loaded from the DB only write the columns that changed (plus
+        `updated`) when the caller does not pass `update_fields`; when it does, any
+        derived column changed here is added to the list so it is not lost.
+        """
+        before = {f: getattr(self, f) for f in _DERIVED_FIELDS}
+        self._normalize()
+
+        if not args and not kwargs.get("force_insert") and not self._state.adding:
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                derived = {f for f in _DERIVED_FIELDS if getattr(self, f) != before[f]}
+                if derived:
+                    kwargs["update_fields"] = set(update_fields) | derived
+            else:
+                changed = self._changed_fields()
+                if changed is not None:
+                    kwargs["update_fields"] = changed | {"updated"}
+
+        result = super().save(*args, **kwargs)
+
+        # Refresh the snapshot for what was actually written
+        saved = kwargs.get("update_fields")
+        if args:
+            self._loaded_values = None
+        elif saved is None:
+            self._loaded_values = self._snapshot()
+        elif getattr(self, "_loaded_values", None) is not None:
+            attnames = {self._meta.get_field(name).attname for name in saved}
+            self._loaded_values.update((k, v) for k, v in self._snapshot().items() if k in attnames)
+        return result
+
+    @classmethod
+    def bulk_upsert(cls, rows, batch_size: int = 500) -> list:
+        """
+        Insert or update many records keyed on `unit_sn`, bypassing save().
+
+        `rows` is an iterable of field dicts (as passed to the model constructor). Each
+        row is normalized like save() would, then written in batches of `batch_size`
+        with an INSERT that updates on conflict. If a unit_sn repeats, the last row wins.
+
+        On an existing record only the columns a row supplies (plus the ones save()
+        derives from them) are overwritten; omitted keys keep their stored values.
+        Rows are grouped by the keys they supply so one row never resets another's.
+
+        Backends that support a conflict target (PostgreSQL, SQLite) upsert ON CONFLICT
+        (unit_sn); MySQL uses ON DUPLICATE KEY, which also fires on the unique audit_id.
+        Elsewhere, a row whose audit_id belongs to a different unit_sn raises
+        IntegrityError.
+
+        pre_save/post_save are NOT sent; `post_bulk_upsert` is sent once with the
+        written instances.
+        """
+        by_sn = {}
+        for row in rows:
+            obj = cls(**row)
+            obj._normalize()
+            by_sn[obj.unit_sn] = (obj, frozenset(row))
+        if not by_sn:
+            return []
+
+        groups = {}
+        for obj, keys in by_sn.values():
+            groups.setdefault(tuple(_upsert_fields(keys)), []).append(obj)
+
+        features = connections[router.db_for_write(cls)].features
+        conflict_target = {"unique_fields": ["unit_sn"]} if features.supports_update_conflicts_with_target else {}
+
+        objs = []
+        for update_fields, group in groups.items():
+            objs += cls.objects.bulk_create(
+                group,
+                update_conflicts=True,
+                update_fields=list(update_fields),
+                batch_size=batch_size,
+                **conflict_target,
+            )
+        post_bulk_upsert.send(sender=cls, instances=objs)
+        return objs
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -136,3 +316,28 @@ class WarrantySyncState(models.Model):
 
     def __str__(self) -> str:
         return f"WarrantySyncState(pk={self.pk}, last_audit_id={self.last_audit_id or '-'})"
+
+
+class WarrantyBuildLink(models.Model):
+    """
+    Maps a unit serial to the Build order that `sc_to_buildorders` created for it.
+
+    Lets the command find a unit's build by primary key instead of scanning Build
+    notes for the `SC_UNIT_SN=...` marker. `build_pk` is a plain integer (not a FK)
+    so this plugin's migrations do not depend on InvenTree's `build` app; links to
+    deleted builds are simply ignored and rewritten on the next run.
+    """
+
+    unit_sn = models.CharField(primary_key=True, max_length=64)
+    build_pk = models.PositiveIntegerField(
+        db_index=True,
+        help_text="Primary key of the InvenTree Build order for this unit.",
+    )
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Warranty Build Link"
+        verbose_name_plural = "Warranty Build Links"
+
+    def __str__(self) -> str:
+        return f"WarrantyBuildLink({self.unit_sn} -> build {self.build_pk})"